@@ -1,24 +1,52 @@
+import io
 import os
-import json
+import copy
+import hashlib
+import time
+import random
+import functools
+import tempfile
+import collections
+from types import MappingProxyType
+from urllib.parse import urlsplit, urlunsplit
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import requests
-import feedparser
-from bs4 import BeautifulSoup
+import xml.etree.ElementTree as ET
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree
+from lxml.html import fragment_fromstring
 
 # =====================
 # Config
 # =====================
 BOT_TOKEN = os.environ.get("BOT_TOKEN")
 CHAT_ID = os.environ.get("CHAT_ID")
+TELEGRAM_URL = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
 STATE_FILE = "state.json"
+BLOOM_FILE = "state.bloom"
 DEBUG = os.environ.get("DEBUG", "false").lower() == "true"
 
+TELEGRAM_MAX_ATTEMPTS = 3
+TELEGRAM_MESSAGE_LIMIT = 4096
+CHECK_INTERVAL = 12 * 3600  # cron cadence in .github/workflows/check-blogs.yml
+BACKOFF_CAP = 4 * CHECK_INTERVAL
+SEEN_LIMIT = 100  # links remembered per source
+MAX_POSTS = 5  # newest posts considered per source
+EXCERPT_LENGTH = 200
+CHUNK_SIZE = 8192  # bytes read per step when streaming the blog page
+BLOOM_BITS = 2**16  # ~0.01 false-positive rate at ~6k links
+BLOOM_HASHES = 7
+
 BLOG_SOURCES = [
     {
         "name": "Helm",
         "url": "https://helm.sh/blog",
         "rss": "https://helm.sh/rss.xml",
         "icon": "⚓",
-        "parser": "helm_parser",
+        "title_xpath": "(.//h2//a)[1]",
+        "excerpt_xpath": "(.//p)[1]",
     }
 ]
 
@@ -31,22 +59,91 @@ def log(msg):
         print(f"[DEBUG] {msg}")
 
 
+@functools.lru_cache(maxsize=4096)
 def normalize_url(url: str) -> str:
-    return url.rstrip("/")
+    # Dedup key: lowercase scheme/host, no trailing slash, fragment or utm_* params
+    parts = urlsplit(url)
+    query = "&".join(
+        kv for kv in parts.query.split("&") if kv and not kv.startswith("utm_")
+    )
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), query, "")
+    )
+
+
+# =====================
+# HTTP
+# =====================
+def make_adapter(status_forcelist, read=None):
+    return HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(
+            total=3,
+            read=read,
+            backoff_factor=0.5,
+            status_forcelist=status_forcelist,
+            allowed_methods=None,  # retry POST too
+        ),
+    )
+
+
+SESSION = requests.Session()
+SESSION.mount("https://", make_adapter([429, 500, 502, 503, 504]))
+# Telegram reports its rate limit in the JSON body, see send_telegram_message.
+# A read error may come after the message was accepted, so never resend then.
+SESSION.mount("https://api.telegram.org/", make_adapter([500, 502, 503, 504], read=0))
+
+
+def conditional_get(url, cache, stream=False):
+    # Returns None when the server answers 304 Not Modified
+    validators = cache.get("validators", {}).get(url, {})
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("modified"):
+        headers["If-Modified-Since"] = validators["modified"]
+
+    r = SESSION.get(url, headers=headers, timeout=10, stream=stream)
+    if r.status_code == 304:
+        r.close()
+        return None
+    r.raise_for_status()
+    return r
+
+
+def remember_validators(url, r, cache):
+    validators = {
+        key: r.headers[header]
+        for key, header in (("etag", "ETag"), ("modified", "Last-Modified"))
+        if r.headers.get(header)
+    }
+    if validators:
+        cache.setdefault("validators", {})[url] = validators
 
 
 # =====================
 # Telegram
 # =====================
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
 def send_telegram_message(text, parse_mode="HTML"):
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": CHAT_ID,
-        "text": text,
-        "parse_mode": parse_mode,
-        "disable_web_page_preview": False,
-    }
-    r = requests.post(url, json=payload, timeout=10)
+    body = orjson.dumps(
+        {
+            "chat_id": CHAT_ID,
+            "text": text,
+            "parse_mode": parse_mode,
+        }
+    )
+    for attempt in range(TELEGRAM_MAX_ATTEMPTS):
+        r = SESSION.post(TELEGRAM_URL, data=body, headers=_JSON_HEADERS, timeout=10)
+        if r.status_code != 429 or attempt + 1 == TELEGRAM_MAX_ATTEMPTS:
+            break
+        parameters = orjson.loads(r.content).get("parameters", {})
+        retry_after = parameters.get("retry_after", 1)
+        log(f"Rate limited by Telegram, retrying in {retry_after}s")
+        time.sleep(retry_after + random.uniform(0, 0.5))
     r.raise_for_status()
 
 
@@ -56,89 +153,272 @@ def send_telegram_message(text, parse_mode="HTML"):
 def load_state():
     if not os.path.exists(STATE_FILE):
         return {}
-    with open(STATE_FILE, "r") as f:
-        return json.load(f)
+    with open(STATE_FILE, "rb") as f:
+        state = orjson.loads(f.read())
+    # Older state files map a source name straight to its last-seen link
+    return {
+        name: entry if isinstance(entry, dict) else {"seen": [normalize_url(entry)]}
+        for name, entry in state.items()
+    }
+
+
+def atomic_write(path, data):
+    # Write a sibling temp file and swap it in, so a crash never leaves a
+    # truncated file behind
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.fchmod(f.fileno(), 0o644)  # mkstemp creates files as 0600
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
 
 
 def save_state(state):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
+    atomic_write(STATE_FILE, orjson.dumps(state, option=orjson.OPT_INDENT_2))
+
+
+# Every link ever sent, in constant space; SEEN_LIMIT only bounds the recent list
+def load_bloom():
+    try:
+        with open(BLOOM_FILE, "rb") as f:
+            bloom = bytearray(f.read())
+    except FileNotFoundError:
+        return bytearray(BLOOM_BITS // 8)
+    if len(bloom) != BLOOM_BITS // 8:
+        log("Bloom filter size changed, starting a new one")
+        return bytearray(BLOOM_BITS // 8)
+    return bloom
+
+
+def save_bloom(bloom):
+    atomic_write(BLOOM_FILE, bytes(bloom))
+
+
+def _bloom_positions(link):
+    digest = hashlib.blake2b(link.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return [(h1 + i * h2) % BLOOM_BITS for i in range(BLOOM_HASHES)]
+
+
+def bloom_add(bloom, link):
+    for pos in _bloom_positions(link):
+        bloom[pos >> 3] |= 1 << (pos & 7)
+
+
+def bloom_contains(bloom, link):
+    return all(bloom[pos >> 3] & (1 << (pos & 7)) for pos in _bloom_positions(link))
 
 
 # =====================
 # Parsers
 # =====================
-def helm_parser(soup, base_url):
-    posts = []
-    for article in soup.find_all("article"):
-        h2 = article.find("h2")
-        if not h2:
-            continue
-        a = h2.find("a")
-        if not a:
+def text_of(el):
+    return "".join(el.itertext()).strip()
+
+
+def short_text(el, limit=EXCERPT_LENGTH):
+    # Stop collecting text once the excerpt is long enough
+    parts = []
+    total = 0
+    for text in el.itertext():
+        parts.append(text)
+        total += len(text.strip())
+        if total >= limit:
+            break
+    return " ".join("".join(parts).split())[:limit]
+
+
+# Subtrees that never carry post content; emptied as soon as they are parsed
+_SKIPPED_TAGS = ("head", "script", "style", "noscript", "svg")
+
+
+def _pull_events(parser, chunks):
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+def iter_articles(chunks, encoding="utf-8"):
+    parser = etree.HTMLPullParser(
+        events=("end",),
+        tag=("article",) + _SKIPPED_TAGS,
+        encoding=encoding,
+        remove_comments=True,
+        remove_pis=True,
+    )
+    for _, article in _pull_events(parser, chunks):
+        if article.tag != "article":
+            article.clear(keep_tail=True)
             continue
+        yield article
+        # Drop what has been handled so memory stays flat on long pages
+        article.clear()
+        while article.getprevious() is not None:
+            del article.getparent()[0]
+
+
+def make_parser(source):
+    # Specialize a parser to one site's article layout; everything it needs
+    # is compiled up front and captured as closure locals
+    title_link = etree.XPath(source["title_xpath"])
+    excerpt_node = etree.XPath(source["excerpt_xpath"])
+    base_url = "/".join(source["url"].split("/")[:3])
 
-        link = a["href"]
-        if link.startswith("/"):
-            link = base_url + link
-
-        excerpt = ""
-        p = article.find("p")
-        if p:
-            excerpt = p.get_text(strip=True)[:200]
-
-        posts.append(
-            {
-                "title": a.get_text(strip=True),
-                "link": normalize_url(link),
-                "excerpt": excerpt,
-            }
-        )
+    def parse(articles):
+        posts = []
+        for article in articles:
+            anchors = title_link(article)
+            if not anchors:
+                continue
+            a = anchors[0]
+
+            link = a.get("href")
+            if not link:
+                continue
+            if link.startswith("/"):
+                link = base_url + link
+
+            paragraphs = excerpt_node(article)
+            posts.append(
+                {
+                    "title": text_of(a),
+                    "link": normalize_url(link),
+                    "excerpt": short_text(paragraphs[0]) if paragraphs else "",
+                }
+            )
+            if len(posts) == MAX_POSTS:
+                break
+        return posts
+
+    return parse
+
+
+# Build each source's parser once, at import, and freeze the result since it
+# never changes at runtime
+BLOG_SOURCES = tuple(
+    MappingProxyType({**source, "parser": make_parser(source)})
+    for source in BLOG_SOURCES
+)
+
+
+def fetch_html_posts(source, cache):
+    r = conditional_get(source["url"], cache, stream=True)
+    if r is None:
+        log("HTML not modified since last check")
+        return []
+
+    # The parser stops pulling chunks once it has enough posts, so the rest
+    # of the page is never downloaded
+    # requests assumes ISO-8859-1 for text/* without a charset, so only an
+    # explicit one is trusted; libxml2 would otherwise guess Latin-1 too
+    if "charset" in r.headers.get("Content-Type", "").lower():
+        encoding = r.encoding
+    else:
+        encoding = "utf-8"
+
+    with r:
+        chunks = r.iter_content(CHUNK_SIZE)
+        posts = source["parser"](iter_articles(chunks, encoding))
+    remember_validators(source["url"], r, cache)
     return posts
 
 
-def fetch_html_posts(source):
-    r = requests.get(source["url"], timeout=10)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.content, "html.parser")
-    base_url = "/".join(source["url"].split("/")[:3])
-    return globals()[source["parser"]](soup, base_url)
+def feed_excerpt(summary):
+    # RSS descriptions and Atom type="html" summaries carry escaped markup
+    if summary is None:
+        return ""
+    text = summary.text or ""
+    if len(summary) == 0 and ("<" in text or "&" in text):
+        summary = fragment_fromstring(summary.text, create_parent=True)
+    return short_text(summary)
 
 
-def fetch_rss_posts(source):
-    feed = feedparser.parse(source["rss"])
+def parse_feed(content):
     posts = []
-    for e in feed.entries:
-        posts.append(
-            {
-                "title": e.title,
-                "link": normalize_url(e.link),
-                "excerpt": e.summary[:200] if "summary" in e else "",
-            }
-        )
+    for _, el in ET.iterparse(io.BytesIO(content)):
+        if el.tag.rpartition("}")[2] not in ("item", "entry"):
+            continue
+
+        # RSS puts the URL in <link>'s text, Atom in its href attribute
+        link = el.findtext("{*}link")
+        if not link and el.find("{*}link") is not None:
+            link = el.find("{*}link").get("href")
+        summary = el.find("{*}description")
+        if summary is None:
+            summary = el.find("{*}summary")
+
+        if link:
+            posts.append(
+                {
+                    "title": (el.findtext("{*}title") or "").strip(),
+                    "link": normalize_url(link.strip()),
+                    "excerpt": feed_excerpt(summary),
+                }
+            )
+        el.clear()
+        if len(posts) == MAX_POSTS:
+            break
     return posts
 
 
-def fetch_posts(source):
+def fetch_rss_posts(source, cache):
+    r = conditional_get(source["rss"], cache)
+    if r is None:
+        log("RSS not modified since last check")
+        return []
+
+    posts = parse_feed(r.content)
+    remember_validators(source["rss"], r, cache)
+    return posts
+
+
+def fetch_posts(source, cache):
     try:
-        log("Trying HTML parser")
-        return fetch_html_posts(source)
+        log("Trying RSS feed")
+        return fetch_rss_posts(source, cache)
     except Exception as e:
-        log(f"HTML failed ({e}), falling back to RSS")
-        return fetch_rss_posts(source)
+        log(f"RSS failed ({e}), falling back to HTML parser")
+        return fetch_html_posts(source, cache)
 
 
 # =====================
 # Formatting
 # =====================
+_HTML_ESCAPES = str.maketrans(
+    {"<": "&lt;", ">": "&gt;", "&": "&amp;", '"': "&quot;", "'": "&#39;"}
+)
+
+
 def format_post(post, source):
     return (
-        f"{source['icon']} <b>{post['title']}</b>\n\n"
-        f"{post['excerpt']}...\n\n"
-        f"🔗 <a href='{post['link']}'>Read more</a>"
+        f"{source['icon']} <b>{post['title'].translate(_HTML_ESCAPES)}</b>\n\n"
+        f"{post['excerpt'].translate(_HTML_ESCAPES)}...\n\n"
+        f"🔗 <a href='{post['link'].translate(_HTML_ESCAPES)}'>Read more</a>"
     )
 
 
+def batch_messages(texts, limit=TELEGRAM_MESSAGE_LIMIT):
+    # Pack consecutive messages into as few Telegram messages as fit
+    batches = []
+    size = 0
+    for text in texts:
+        if not batches or size + 2 + len(text) > limit:
+            batches.append([])
+            size = -2
+        batches[-1].append(text)
+        size += 2 + len(text)
+    return ["\n\n".join(batch) for batch in batches]
+
+
 # =====================
 # Main
 # =====================
@@ -149,37 +429,80 @@ def main():
     state = load_state()
     log(f"Loaded state: {state}")
 
-    updated_state = {}
+    previous_state = copy.deepcopy(state)
+    bloom = load_bloom()
+    previous_bloom = bytes(bloom)
     outgoing = []
+    queued = set()  # links already queued this run, across sources
+    failed = []
 
+    now = time.time()
+    due = []
     for source in BLOG_SOURCES:
-        name = source["name"]
-        last_seen = normalize_url(state.get(name, "")) if state.get(name) else None
+        entry = state.setdefault(source["name"], {})
+        if entry.get("retry_at", 0) > now:
+            print(f"{source['name']}: backing off after {entry['failures']} failure(s)")
+            continue
+        due.append((source, entry))
+
+    # Fetches are network-bound, so overlap them; each touches only its own entry
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(due)))) as executor:
+        futures = [executor.submit(fetch_posts, source, entry) for source, entry in due]
 
-        posts = fetch_posts(source)
+    for (source, entry), future in zip(due, futures):
+        name = source["name"]
+        try:
+            posts = future.result()
+        except Exception as e:
+            entry["failures"] = entry.get("failures", 0) + 1
+            delay = min(BACKOFF_CAP, CHECK_INTERVAL * 2 ** (entry["failures"] - 1))
+            # Half an interval of slack so cron drift never skips a due run
+            entry["retry_at"] = now + delay - CHECK_INTERVAL / 2
+            print(f"{name}: fetch failed ({e}), next attempt in {delay}s")
+            failed.append(name)
+            continue
+        entry.pop("failures", None)
+        entry.pop("retry_at", None)
         log(f"Fetched {len(posts)} posts")
 
+        seen_links = collections.deque(entry.get("seen", []), maxlen=SEEN_LIMIT)
+        seen = set(seen_links)
         new_posts = []
 
+        # Check the filter as loaded, not as grown by earlier sources this run,
+        # so a link shared with another source does not end this scan early
         for post in posts:  # newest → oldest
-            if last_seen and post["link"] == last_seen:
-                log("Reached last-seen post, stopping")
+            if post["link"] in seen or bloom_contains(previous_bloom, post["link"]):
+                log("Reached an already-seen post, stopping")
                 break
             new_posts.append(post)
 
-        if new_posts:
-            updated_state[name] = posts[0]["link"]
-
-        outgoing.extend(reversed(new_posts))
+        new_posts.reverse()
+        seen_links.extend(post["link"] for post in new_posts)
+        entry["seen"] = list(seen_links)
+        for link in seen_links:
+            bloom_add(bloom, link)
+        for post in new_posts:
+            if post["link"] in queued:
+                continue  # already going out via another source
+            queued.add(post["link"])
+            outgoing.append((post, source))
         print(f"{name}: {len(new_posts)} new post(s)")
 
-    for post in outgoing:
-        send_telegram_message(format_post(post, source))
+    messages = [format_post(post, source) for post, source in outgoing]
+    for text in batch_messages(messages):
+        send_telegram_message(text)
+    for post, _ in outgoing:
         print(f"Sent: {post['title']}")
 
-    if updated_state:
-        save_state(updated_state)
-        print(f"State updated: {updated_state}")
+    if state != previous_state:
+        save_state(state)
+        print(f"State updated: {state}")
+    if bloom != previous_bloom:
+        save_bloom(bloom)
+
+    if failed:
+        raise SystemExit(f"Fetch failed for: {', '.join(failed)}")
 
 
 if __name__ == "__main__":
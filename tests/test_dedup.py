@@ -15,3 +15,12 @@ def test_newest_seen_means_no_new_posts():
         new_posts.append(p)
 
     assert new_posts == []
+
+
+def test_normalize_url_drops_noise():
+    assert normalize_url("HTTPS://Helm.sh/blog/helm-4/?utm_source=x&page=2#top") == (
+        "https://helm.sh/blog/helm-4?page=2"
+    )
+    assert normalize_url("https://helm.sh/blog/helm-4-released") == (
+        "https://helm.sh/blog/helm-4-released"
+    )
@@ -0,0 +1,22 @@
+from check_once import batch_messages, format_post
+
+
+def test_format_post_escapes_html():
+    post = {
+        "title": "Helm <4> & friends",
+        "link": "https://helm.sh/blog/it's-here",
+        "excerpt": "Use <b>--atomic</b>",
+    }
+
+    assert format_post(post, {"icon": "⚓"}) == (
+        "⚓ <b>Helm &lt;4&gt; &amp; friends</b>\n\n"
+        "Use &lt;b&gt;--atomic&lt;/b&gt;...\n\n"
+        "🔗 <a href='https://helm.sh/blog/it&#39;s-here'>Read more</a>"
+    )
+
+
+def test_batch_messages_respects_limit():
+    texts = ["a" * 40, "b" * 40, "c" * 40]
+
+    assert batch_messages(texts, limit=90) == ["a" * 40 + "\n\n" + "b" * 40, "c" * 40]
+    assert batch_messages([], limit=90) == []
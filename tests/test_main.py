@@ -0,0 +1,81 @@
+import pytest
+
+import check_once
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    monkeypatch.setattr(check_once, "STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setattr(check_once, "BLOOM_FILE", str(tmp_path / "state.bloom"))
+    monkeypatch.setattr(check_once, "BOT_TOKEN", "token")
+    monkeypatch.setattr(check_once, "CHAT_ID", "chat")
+    sent = []
+    monkeypatch.setattr(check_once, "send_telegram_message", sent.append)
+    return sent
+
+
+def source(name):
+    return {"name": name, "icon": "⚓"}
+
+
+def post(link):
+    return {"title": link, "link": link, "excerpt": ""}
+
+
+def test_shared_link_is_sent_once_without_cutting_other_sources(run, monkeypatch):
+    feeds = {
+        "A": [post("https://a.example/new"), post("https://shared.example/post")],
+        "B": [
+            post("https://b.example/new"),
+            post("https://shared.example/post"),
+            post("https://b.example/older"),
+        ],
+    }
+    check_once.save_state(
+        {
+            "A": {"seen": ["https://a.example/old"]},
+            "B": {"seen": ["https://b.example/oldest"]},
+        }
+    )
+    monkeypatch.setattr(check_once, "BLOG_SOURCES", (source("A"), source("B")))
+    monkeypatch.setattr(check_once, "fetch_posts", lambda s, entry: feeds[s["name"]])
+
+    check_once.main()
+
+    text = "\n".join(run)
+    for link in (
+        "https://a.example/new",
+        "https://b.example/new",
+        "https://b.example/older",
+    ):
+        assert text.count(f"href='{link}'") == 1
+    assert text.count("href='https://shared.example/post'") == 1
+    assert check_once.load_state()["B"]["seen"] == [
+        "https://b.example/oldest",
+        "https://b.example/older",
+        "https://shared.example/post",
+        "https://b.example/new",
+    ]
+
+
+def test_failed_fetch_backs_off_and_fails_the_run(run, monkeypatch):
+    calls = []
+
+    def failing_fetch(source, entry):
+        calls.append(source["name"])
+        raise RuntimeError("down")
+
+    monkeypatch.setattr(check_once, "BLOG_SOURCES", (source("A"),))
+    monkeypatch.setattr(check_once, "fetch_posts", failing_fetch)
+
+    with pytest.raises(SystemExit, match="Fetch failed for: A"):
+        check_once.main()
+
+    entry = check_once.load_state()["A"]
+    assert entry["failures"] == 1
+    assert entry["retry_at"] > check_once.time.time()
+
+    check_once.main()  # still inside the backoff window
+
+    assert calls == ["A"]
+    assert run == []
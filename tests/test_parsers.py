@@ -0,0 +1,166 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+from lxml.html import fragment_fromstring
+
+import check_once
+from check_once import (
+    BLOG_SOURCES,
+    EXCERPT_LENGTH,
+    MAX_POSTS,
+    iter_articles,
+    parse_feed,
+    short_text,
+)
+
+helm_parser = next(s["parser"] for s in BLOG_SOURCES if s["name"] == "Helm")
+
+
+def chunked(data, size=16):
+    return (data[i : i + size] for i in range(0, len(data), size))
+
+
+PAGE = """
+<html><head><script>var posts = [];</script></head><body>
+  <nav><a href="/docs">Docs</a></nav>
+  <article>
+    <h2><a href="/blog/helm-4-released/">Helm 4 Released</a></h2>
+    <p>Helm 4 is <script>track()</script><b>here</b>.<!-- note --></p>
+  </article>
+  <article>
+    <h2>No link</h2>
+  </article>
+  <article>
+    <h2><a href="https://helm.sh/blog/older">Older post</a></h2>
+  </article>
+</body></html>
+"""
+
+
+def test_helm_parser_extracts_posts():
+    posts = helm_parser(iter_articles(chunked(PAGE.encode())))
+
+    assert posts == [
+        {
+            "title": "Helm 4 Released",
+            "link": "https://helm.sh/blog/helm-4-released",
+            "excerpt": "Helm 4 is here.",
+        },
+        {"title": "Older post", "link": "https://helm.sh/blog/older", "excerpt": ""},
+    ]
+
+
+def test_helm_parser_stops_after_max_posts():
+    page = "".join(
+        f'<article><h2><a href="/blog/{i}">Post {i}</a></h2></article>'
+        for i in range(MAX_POSTS + 3)
+    )
+
+    chunks = chunked(page.encode())
+
+    posts = helm_parser(iter_articles(chunks))
+
+    assert [p["title"] for p in posts] == [f"Post {i}" for i in range(MAX_POSTS)]
+    assert next(chunks, None) is not None  # the rest of the page was never read
+
+
+def test_parse_feed_handles_rss_and_atom():
+    rss = b"""<rss version="2.0"><channel>
+      <item><title>Helm 4</title><link>https://helm.sh/blog/helm-4/</link>
+        <description>Hello</description></item>
+      <item><title>No link</title></item>
+    </channel></rss>"""
+    atom = b"""<feed xmlns="http://www.w3.org/2005/Atom">
+      <entry><title>Atom post</title><link href="https://helm.sh/blog/atom"/>
+        <summary>Hi</summary></entry>
+    </feed>"""
+
+    assert parse_feed(rss) == [
+        {"title": "Helm 4", "link": "https://helm.sh/blog/helm-4", "excerpt": "Hello"}
+    ]
+    assert parse_feed(atom) == [
+        {"title": "Atom post", "link": "https://helm.sh/blog/atom", "excerpt": "Hi"}
+    ]
+
+
+def test_short_text_is_bounded():
+    el = fragment_fromstring("<p>" + "<span>word </span>" * 500 + "</p>")
+
+    text = short_text(el)
+
+    assert len(text) == EXCERPT_LENGTH
+    assert text.startswith("word word")
+
+
+def test_iter_articles_decodes_utf8_without_meta_charset():
+    page = '<article><h2><a href="/blog/cafe">Helm 4 — Café</a></h2></article>'
+
+    posts = helm_parser(iter_articles(chunked(page.encode("utf-8"))))
+
+    assert posts[0]["title"] == "Helm 4 — Café"
+
+
+def test_parse_feed_strips_markup_from_summaries():
+    rss = b"""<rss version="2.0"><channel>
+      <item><title>Helm 4</title><link>https://helm.sh/blog/helm-4</link>
+        <description><![CDATA[<p>Hello <b>world</b></p>]]></description></item>
+    </channel></rss>"""
+    atom = b"""<feed xmlns="http://www.w3.org/2005/Atom">
+      <entry><title>Atom post</title><link href="https://helm.sh/blog/atom"/>
+        <summary type="html">&lt;p&gt;Hi &amp;amp; bye&lt;/p&gt;</summary></entry>
+      <entry><title>Entities</title><link href="https://helm.sh/blog/entities"/>
+        <summary type="html">Helm&amp;rsquo;s new &amp;amp; shiny</summary></entry>
+    </feed>"""
+
+    assert parse_feed(rss)[0]["excerpt"] == "Hello world"
+    assert [p["excerpt"] for p in parse_feed(atom)] == [
+        "Hi & bye",
+        "Helm\u2019s new & shiny",
+    ]
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_rss_conditional_get(monkeypatch):
+    feed = b"""<rss><channel><item><title>Helm 4</title>
+      <link>https://helm.sh/blog/helm-4</link></item></channel></rss>"""
+    responses = [
+        FakeResponse(200, feed, {"ETag": '"v1"', "Last-Modified": "Mon, 1 Jan"}),
+        FakeResponse(304),
+        FakeResponse(200, b"<rss><broken", {"ETag": '"v2"'}),
+    ]
+    sent_headers = []
+
+    def fake_get(url, headers, timeout, stream=False):
+        assert url == "https://helm.sh/rss.xml"
+        sent_headers.append(headers)
+        return responses.pop(0)
+
+    monkeypatch.setattr(check_once.SESSION, "get", fake_get)
+    source = {"rss": "https://helm.sh/rss.xml"}
+    cache = {}
+    validators = {"https://helm.sh/rss.xml": {"etag": '"v1"', "modified": "Mon, 1 Jan"}}
+
+    assert [p["title"] for p in check_once.fetch_rss_posts(source, cache)] == ["Helm 4"]
+    assert cache == {"validators": validators}
+
+    assert check_once.fetch_rss_posts(source, cache) == []
+    assert sent_headers[1] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 1 Jan",
+    }
+
+    with pytest.raises(ET.ParseError):
+        check_once.fetch_rss_posts(source, cache)
+    assert cache == {"validators": validators}
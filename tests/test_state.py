@@ -0,0 +1,33 @@
+import json
+
+import check_once
+
+
+def test_legacy_state_is_migrated(tmp_path, monkeypatch):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"Helm": "https://helm.sh/blog/helm-4-released"}))
+    monkeypatch.setattr(check_once, "STATE_FILE", str(path))
+
+    state = check_once.load_state()
+
+    assert state == {"Helm": {"seen": ["https://helm.sh/blog/helm-4-released"]}}
+
+
+def test_save_state_round_trips(tmp_path, monkeypatch):
+    monkeypatch.setattr(check_once, "STATE_FILE", str(tmp_path / "state.json"))
+    state = {"Helm": {"seen": ["https://helm.sh/blog/helm-4-released"]}}
+
+    check_once.save_state(state)
+
+    assert check_once.load_state() == state
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_bloom_remembers_added_links():
+    bloom = bytearray(check_once.BLOOM_BITS // 8)
+
+    check_once.bloom_add(bloom, "https://helm.sh/blog/helm-4-released")
+
+    assert check_once.bloom_contains(bloom, "https://helm.sh/blog/helm-4-released")
+    assert not check_once.bloom_contains(bloom, "https://helm.sh/blog/helm-3")
+